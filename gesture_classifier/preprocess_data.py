@@ -322,7 +322,7 @@ class PreProcess:
             print(f"Processing file: {filename}")
             emg_data = emg_proc.notch_filter(emg_data, sampling_rate, 60)
             filt_data = emg_proc.filter_emg(emg_data, filter_type='bandpass', lowcut=30, highcut=500, fs=sampling_rate, verbose=True)
-            car_data = emg_proc.common_average_reference(filt_data, True)
+            car_data = emg_proc.common_average_reference(filt_data, True, out=filt_data)  # In-place, filt_data is not reused
             grid_data = emg_proc.compute_grid_average(car_data, 8, 0)
             grid_ch = list(range(grid_data.shape[0]))
             rms_data = emg_proc.window_rms(car_data, window_size=800, verbose=True)
@@ -69,7 +69,8 @@ class IntanEMG:
         self.verbose = verbose
         self.sample_rate = None  # Sample rate of the Intan system, gets set during initialization
         self.all_stop = False
-        self.ring_buffer = RingBuffer(len(self.channels), ring_buffer_size)
+        # Raw 16-bit samples are buffered as-is and only scaled to microvolts when a window is read out
+        self.ring_buffer = RingBuffer(len(self.channels), ring_buffer_size, dtype=np.int16, scale=SAMPLE_SCALE_FACTOR)
         self.pico = None
         self.last_gesture = None
         if use_serial:
@@ -186,18 +187,17 @@ class IntanEMG:
                         raw_timestamp, raw_index = readInt32(raw_data, raw_index)  # Read timestamp (microseconds)
                         timestamp = raw_timestamp / self.sample_rate  # Convert to seconds
 
-                        frame_data = np.zeros(len(self.channels))
+                        frame_data = np.zeros(len(self.channels), dtype=np.int16)
                         for ch in range(len(self.channels)):
                             raw_sample, raw_index = readUint16(raw_data, raw_index)
-                            sample = SAMPLE_SCALE_FACTOR * (raw_sample - 32768)  # Scale to microvolts
-                            # Update the frame data by channel
-                            frame_data[ch] = sample
+                            # Update the frame data by channel, the ring buffer scales to microvolts on read
+                            frame_data[ch] = raw_sample - 32768
 
                         self.ring_buffer.append(timestamp, frame_data)
 
                 end_t = time.time()
                 if self.verbose:
-                    print(f"Buffer length: {len(self.ring_buffer.samples)} samples.")
+                    print(f"Buffer length: {self.ring_buffer.size} samples.")
                 if self.verbose:
                     print(f"Intan data sampled in: {end_t - start_t:.4f} seconds")
                 await asyncio.sleep(0)
@@ -214,7 +214,7 @@ class IntanEMG:
 
     def get_samples(self, n=1):
         try:
-            emg_data, t = self.ring_buffer.get_samples(n)
+            emg_data, t = self.ring_buffer.get_samples_f32(n)
             return emg_data, t
         except ValueError as e:
             print(f"Error: {e}")
@@ -257,7 +257,7 @@ class IntanEMG:
 
                 try:
                     emg_data, t = self.get_samples(2000) # Pass in the number of samples (0.25 seconds)
-                    if emg_data is None or len(emg_data) == 0:
+                    if emg_data is None or emg_data.size == 0:
                         await asyncio.sleep(0.1)
                         continue
 
@@ -265,7 +265,7 @@ class IntanEMG:
                     if self.show_plot:
                          # Update each channels subplot
                          for i, channel in enumerate(self.channels):
-                             y = emg_data[:, i]
+                             y = emg_data[i, :]
                              self.ax[i].cla()
                              self.ax[i].plot(t, y)
                              self.ax[i].set_ylim(-1000, 1000)
@@ -283,7 +283,7 @@ class IntanEMG:
                     #pca_data, explained_variance = emg_proc.apply_pca(norm_emg, num_components=31)
 
                     # ===== Method 2 ======
-                    #feature_data = emg_proc.extract_wavelet_features(emg_data)
+                    #feature_data = emg_proc.extract_wavelet_features(emg_data.T)
                     #if feature_data is None or len(feature_data) == 0:
                     #    print("feature extraction returned no data.")
                     #    continue
@@ -305,7 +305,6 @@ class IntanEMG:
                     #print(f"Selected data shape: {emg_data.shape}")
 
                     # ===== Method 3 (working!) ======
-                    emg_data = emg_data.T  # Transpose to have shape (num_channels, num_samples)
                     filtered_data = emg_proc.notch_filter(emg_data, fs=self.sample_rate, f0=60)  # 60Hz notch filter
                     filtered_data = emg_proc.butter_bandpass_filter(filtered_data, lowcut=20, highcut=400,
                                                                     fs=self.sample_rate, order=2, axis=1)  # bandpass filter
@@ -3,16 +3,30 @@
 """
 import os
 import time
+import functools
 import pywt
 import numpy as np
 import pandas as pd
-from scipy.signal import find_peaks, peak_widths, butter, filtfilt, hilbert, iirnotch
+import scipy.signal as sp_signal
+from joblib import Parallel, delayed
+from scipy.fft import rfft
+from scipy.ndimage import convolve1d, uniform_filter1d
+from scipy.signal import find_peaks, peak_widths, butter, filtfilt, sosfiltfilt, iirnotch, firwin
 from sklearn.decomposition import PCA
 from sklearn.preprocessing import StandardScaler
 
+try:
+    from numba import njit, prange
+except ImportError:  # numba is optional, the feature kernels fall back to numpy
+    njit = None
+
 # Define constants for windowing parameters and feature extraction
 WINDOW_SIZE = 400
 OVERLAP = 200
+_DB4 = pywt.Wavelet('db4')  # Built once instead of looking the wavelet up by name on every decomposition
+
+# Window length above which weighted moving averages switch from direct to overlap-add convolution
+OACONVOLVE_MIN_WINDOW = 128
 
 
 def parse_channel_ranges(channel_arg):
@@ -42,47 +56,175 @@ def parse_channel_ranges(channel_arg):
 
 
 # Define feature extraction functions
+def _wavelet_coeff_stats(coeff):
+    """
+    Computes the 19 statistical features for a batch of wavelet coefficients.
+
+    Args:
+        coeff: Numpy array of shape (num_windows, num_channels, num_coeffs).
+
+    Returns:
+        Numpy array of shape (num_windows, num_channels, 19).
+    """
+    # Intermediates shared between several features, computed once
+    abs_coeff = np.abs(coeff)
+    sq_coeff = coeff * coeff
+    d1 = np.diff(coeff, axis=-1)
+    abs_d1 = np.abs(d1)
+    d2 = np.diff(d1, axis=-1)
+    d3 = np.diff(d2, axis=-1)
+    mean_sq = sq_coeff.mean(axis=-1)
+    d1_var = d1.var(axis=-1)
+
+    return np.stack([
+        abs_coeff.sum(axis=-1),  # IEMG
+        abs_coeff.mean(axis=-1),  # MAV
+        sq_coeff.sum(axis=-1),  # SSI
+        np.sqrt(mean_sq),  # RMS
+        coeff.var(axis=-1),  # VAR
+        (coeff > 0).mean(axis=-1),  # MYOP
+        abs_d1.sum(axis=-1),  # WL
+        abs_d1.mean(axis=-1),  # DAMV
+        mean_sq,  # Second-order moment (M2)
+        d1_var,  # DVARV
+        np.sqrt(d1_var),  # DASDV
+        (abs_coeff > 0.05).sum(axis=-1),  # WAMP (threshold = 0.05)
+        np.abs(d2).sum(axis=-1),  # IASD
+        np.abs(d3).sum(axis=-1),  # IATD
+        np.exp(abs_coeff).sum(axis=-1),  # IEAV
+        np.log(abs_coeff + 1e-6).sum(axis=-1),  # IALV
+        np.exp(coeff).sum(axis=-1),  # IE
+        coeff.min(axis=-1),  # MIN
+        coeff.max(axis=-1)  # MAX
+    ], axis=-1)
+
+
+if njit is not None:
+    # Reassociation/contraction let the reductions vectorize, while keeping IEEE inf/nan semantics for exp() overflow
+    @njit(parallel=True, fastmath={'reassoc', 'contract'}, cache=True)
+    def _wavelet_stats(coeff, out):
+        """
+        Numba kernel computing the same 19 features as _wavelet_coeff_stats, touching each coefficient array in a
+        single fused loop instead of one numpy pass per statistic.
+
+        Args:
+            coeff: Numpy array of shape (num_windows, num_channels, num_coeffs).
+            out: Preallocated float64 array of shape (num_windows, num_channels, 19) to fill.
+        """
+        num_windows, num_channels, n = coeff.shape
+        for w in prange(num_windows):
+            for c in range(num_channels):
+                x = coeff[w, c]
+                s = 0.0
+                s_abs = 0.0
+                s_sq = 0.0
+                n_pos = 0
+                n_wamp = 0
+                s_exp_abs = 0.0
+                s_log_abs = 0.0
+                s_exp = 0.0
+                x_min = x[0]
+                x_max = x[0]
+                s_d1 = 0.0
+                s_abs_d1 = 0.0
+                s_abs_d2 = 0.0
+                s_abs_d3 = 0.0
+                for t in range(n):
+                    v = x[t]
+                    a = abs(v)
+                    s += v
+                    s_abs += a
+                    s_sq += v * v
+                    if v > 0:
+                        n_pos += 1
+                    if a > 0.05:
+                        n_wamp += 1
+                    s_exp_abs += np.exp(a)
+                    s_log_abs += np.log(a + 1e-6)
+                    s_exp += np.exp(v)
+                    x_min = min(x_min, v)
+                    x_max = max(x_max, v)
+                    if t + 1 < n:
+                        d1 = x[t + 1] - v
+                        s_d1 += d1
+                        s_abs_d1 += abs(d1)
+                    if t + 2 < n:
+                        s_abs_d2 += abs(x[t + 2] - 2.0 * x[t + 1] + v)
+                    if t + 3 < n:
+                        s_abs_d3 += abs(x[t + 3] - 3.0 * x[t + 2] + 3.0 * x[t + 1] - v)
+
+                # Second pass over the (cache resident) window for numerically stable centered variances
+                mean = s / n
+                mean_d1 = s_d1 / (n - 1)
+                var = 0.0
+                var_d1 = 0.0
+                for t in range(n):
+                    var += (x[t] - mean) ** 2
+                    if t + 1 < n:
+                        var_d1 += (x[t + 1] - x[t] - mean_d1) ** 2
+                var /= n
+                var_d1 /= n - 1
+
+                o = out[w, c]
+                o[0] = s_abs  # IEMG
+                o[1] = s_abs / n  # MAV
+                o[2] = s_sq  # SSI
+                o[3] = np.sqrt(s_sq / n)  # RMS
+                o[4] = var  # VAR
+                o[5] = n_pos / n  # MYOP
+                o[6] = s_abs_d1  # WL
+                o[7] = s_abs_d1 / (n - 1)  # DAMV
+                o[8] = s_sq / n  # Second-order moment (M2)
+                o[9] = var_d1  # DVARV
+                o[10] = np.sqrt(var_d1)  # DASDV
+                o[11] = n_wamp  # WAMP (threshold = 0.05)
+                o[12] = s_abs_d2  # IASD
+                o[13] = s_abs_d3  # IATD
+                o[14] = s_exp_abs  # IEAV
+                o[15] = s_log_abs  # IALV
+                o[16] = s_exp  # IE
+                o[17] = x_min  # MIN
+                o[18] = x_max  # MAX
+
+
 def extract_wavelet_features(emg_data, window_size=WINDOW_SIZE, overlap=OVERLAP):
-    features = []
+    """
+    Extracts 19 statistical features from each level of a 2-level db4 wavelet decomposition, for every window and
+    channel of the EMG data.
+
+    Args:
+        emg_data: Numpy array of shape (num_samples, num_channels).
+        window_size: Window size in number of samples.
+        overlap: Number of samples shared by consecutive windows.
+
+    Returns:
+        features: Numpy array of shape (num_windows, num_channels * 3 * 19).
+    """
     num_samples, num_channels = emg_data.shape
     print(f"Num samples: {num_samples}, Num channels: {num_channels}")
     step = window_size - overlap
+    if num_samples < window_size:
+        return np.array([])
+
+    # Zero-copy strided view of all windows, shape (num_windows, num_channels, window_size)
+    windows = sliding_window(emg_data.T, window_size, step)
+
+    # Apply 2-level wavelet decomposition using db4 mother wavelet to all windows and channels at once,
+    # equivalent to pywt.wavedec(windows, 'db4', level=2, axis=-1)
+    cA1, cD1 = pywt.dwt(windows, _DB4, axis=-1)
+    cA2, cD2 = pywt.dwt(cA1, _DB4, axis=-1)
+    coeffs = (cA2, cD2, cD1)
+
+    # Extract 19 statistical features from the approximation and detail coefficients
+    # Features are ordered per channel, then per coefficient level, then per statistic
+    if njit is not None:
+        features = np.empty(windows.shape[:2] + (len(coeffs), 19))
+        for i, coeff in enumerate(coeffs):
+            _wavelet_stats(np.ascontiguousarray(coeff), features[:, :, i])
+    else:
+        features = np.stack([_wavelet_coeff_stats(coeff) for coeff in coeffs], axis=2)
 
-    for start in range(0, num_samples - window_size + 1, step):
-        window = emg_data[start:start + window_size]
-        window_features = []
-
-        for channel_data in window.T:
-            # Apply 2-level wavelet decomposition using dbl mother wavelet
-            coeffs = pywt.wavedec(channel_data, 'db4', level=2)
-
-            # Extract 19 statistical features from the detail and approximation coefficients
-            # Or pick and choose the features you want to extract
-            for coeff in coeffs:
-                window_features.extend([
-                    np.sum(np.abs(coeff)),  # IEMG
-                    np.mean(np.abs(coeff)),  # MAV
-                    np.sum(coeff ** 2),  # SSI
-                    np.sqrt(np.mean(coeff ** 2)),  # RMS
-                    np.var(coeff),  # VAR
-                    np.mean(coeff > 0),  # MYOP
-                    np.sum(np.abs(np.diff(coeff))),  # WL
-                    np.mean(np.abs(np.diff(coeff))),  # DAMV
-                    np.sum(coeff ** 2) / len(coeff),  # Second-order moment (M2)
-                    np.var(np.diff(coeff)),  # DVARV
-                    np.std(np.diff(coeff)),  # DASDV
-                    np.sum(np.abs(coeff) > 0.05),  # WAMP (threshold = 0.05)
-                    np.sum(np.abs(np.diff(coeff, 2))),  # IASD
-                    np.sum(np.abs(np.diff(coeff, 3))),  # IATD
-                    np.sum(np.exp(np.abs(coeff))),  # IEAV
-                    np.sum(np.log(np.abs(coeff) + 1e-6)),  # IALV
-                    np.sum(np.exp(coeff)),  # IE
-                    np.min(coeff),  # MIN
-                    np.max(coeff)  # MAX
-                ])
-        features.append(window_features)
-
-    return np.array(features)
+    return features.reshape(features.shape[0], -1)
 
 def read_config_file(config_file):
     # Dictionary to store the key-value pairs
@@ -111,32 +253,43 @@ def get_metrics_file(metrics_filepath, verbose=False):
         print(f"Metrics file not found: {metrics_filepath}. Please correct file path or generate the metrics file.")
         return None
 
+@functools.lru_cache(maxsize=32)
+def _iirnotch_coeffs(f0, Q, fs):
+    # Cached so repeated calls on streamed chunks don't redesign the same filter
+    b, a = iirnotch(f0, Q, fs)
+    return tuple(b), tuple(a)
+
+
 def notch_filter(data, fs=4000, f0=60.0, Q=30):
     """Applies a notch filter to the data to remove 60 Hz interference.
         Assumes data shape (n_channels, n_samples).
     """
-    b, a = iirnotch(f0, Q, fs)
-    return filtfilt(b, a, data, axis=1)
+    b, a = _iirnotch_coeffs(f0, Q, fs)
+    return filtfilt(np.asarray(b), np.asarray(a), data, axis=1)
 
+# Filter designs only depend on a few scalars, so they are cached and returned as (immutable) tuples.
+# Butterworth filters are designed as second-order sections, which stay numerically stable at higher orders.
+@functools.lru_cache(maxsize=32)
 def butter_bandpass(lowcut, highcut, fs, order=5):
     # butterworth bandpass filter
     nyq = 0.5 * fs
     low = lowcut / nyq
     high = highcut / nyq
-    b, a = butter(order, [low, high], btype='band')
-    return b, a
+    sos = butter(order, [low, high], btype='band', output='sos')
+    return tuple(map(tuple, sos))
 
 
+@functools.lru_cache(maxsize=32)
 def butter_lowpass(cutoff, fs, order=5):
     nyq = 0.5 * fs
     norm_cutoff = cutoff / nyq
-    b, a = butter(order, norm_cutoff, btype='low')
-    return b, a
+    sos = butter(order, norm_cutoff, btype='low', output='sos')
+    return tuple(map(tuple, sos))
 
 
 def butter_lowpass_filter(data, cutoff, fs, order=5, axis=0):
-    b, a = butter_lowpass(cutoff, fs, order)
-    y = filtfilt(b, a, data, axis=axis)  # Filter along axis 0 (time axis) for all channels simultaneously
+    sos = butter_lowpass(cutoff, fs, order)
+    y = sosfiltfilt(np.asarray(sos), data, axis=axis)  # Filter along axis 0 (time axis) for all channels simultaneously
     return y
 
 
@@ -144,12 +297,75 @@ def butter_bandpass_filter(data, lowcut, highcut, fs, order=5, axis=0, verbose=F
     if verbose:
         print(f"| Applying butterworth bandpass filter: {lowcut}-{highcut} Hz {order} order")
     # function to implement filter on data
-    b, a = butter_bandpass(lowcut, highcut, fs, order=order)
-    y = filtfilt(b, a, data, axis=axis)  # Filter channels simultaneously
+    sos = butter_bandpass(lowcut, highcut, fs, order=order)
+    y = sosfiltfilt(np.asarray(sos), data, axis=axis)  # Filter channels simultaneously
     return y
 
 
-def filter_emg(emg_data, filter_type='bandpass', lowcut=30, highcut=500, fs=1259, order=5, verbose=False):
+def fir_filter(b, x, axis=-1, zero_phase=False):
+    """
+    Applies an FIR filter (denominator a = [1]) as a direct convolution with scipy.ndimage.convolve1d, which is much
+    faster than lfilter, especially along axes other than the last.
+
+    Args:
+        b: FIR filter taps.
+        x: Numpy array with the data to filter.
+        axis: Axis to filter along.
+        zero_phase: If False, the output equals lfilter(b, [1], x, axis=axis) (causal, zero initial conditions).
+            If True, the taps are centered on each sample, which for symmetric (linear-phase) taps, e.g. from firwin,
+            gives a zero-phase filter in a single pass.
+
+    Returns:
+        Filtered data (same shape as input).
+    """
+    b = np.asarray(b)
+    x = np.asarray(x, dtype=np.result_type(x, b))  # convolve1d keeps the input dtype, so avoid integer output
+    origin = 0 if zero_phase else -(len(b) // 2)
+    return convolve1d(x, b, axis=axis, mode='constant', cval=0.0, origin=origin)
+
+
+@functools.lru_cache(maxsize=32)
+def fir_lowpass(cutoff, fs, numtaps=101):
+    # Linear-phase windowed-sinc lowpass, numtaps is forced odd so the taps are symmetric around a center sample
+    return tuple(firwin(numtaps | 1, cutoff, fs=fs))
+
+
+def fir_lowpass_filter(data, cutoff, fs, numtaps=101, axis=0):
+    b = fir_lowpass(cutoff, fs, numtaps)
+    y = fir_filter(b, data, axis=axis, zero_phase=True)  # Zero-phase in a single pass, no filtfilt needed
+    return y
+
+
+def _get_backend(backend):
+    """
+    Returns the array and signal processing modules for the requested backend.
+
+    Args:
+        backend: 'numpy' to process on the CPU with scipy, or 'cupy' to process on the GPU with cupyx.
+
+    Returns:
+        xp: Array module (numpy or cupy).
+        xsig: Signal processing module (scipy.signal or cupyx.scipy.signal).
+    """
+    if backend == 'numpy':
+        return np, sp_signal
+    elif backend == 'cupy':
+        # Optional dependency, only needed for GPU processing
+        import cupy as cp
+        import cupyx.scipy.signal as csig
+        return cp, csig
+    raise ValueError(f"Unsupported backend: {backend}")
+
+
+def _to_input_type(result, data, xp):
+    """Copies a GPU result back to the host unless the input data was already on the GPU."""
+    if xp is np or isinstance(data, xp.ndarray):
+        return result
+    return xp.asnumpy(result)
+
+
+def filter_emg(emg_data, filter_type='bandpass', lowcut=30, highcut=500, fs=1259, order=5, verbose=False, axis=0,
+               backend='numpy'):
     """
     Applies a bandpass or lowpass filter to EMG data using numpy arrays.
 
@@ -161,26 +377,31 @@ def filter_emg(emg_data, filter_type='bandpass', lowcut=30, highcut=500, fs=1259
         fs: Sampling rate of the EMG data.
         order: Filter order.
         verbose: Whether to print progress.
+        axis: Time axis of the data to filter along.
+        backend: 'numpy' to filter on the CPU, or 'cupy' to filter on the GPU. Numpy input is transferred to the GPU
+            and back once, cupy input stays on the GPU.
 
     Returns:
-        Filtered data as a numpy array (same shape as input data).
+        Filtered data as an array (same shape and array type as input data).
     """
     tic = time.process_time()
 
+    xp, xsig = _get_backend(backend)
+
     if filter_type == 'bandpass':
         if verbose: print(f"| Applying butterworth bandpass filter: {lowcut}-{highcut} Hz {order} order")
-        filtered_data = butter_bandpass_filter(emg_data, lowcut, highcut, fs, order)
+        sos = butter_bandpass(lowcut, highcut, fs, order)
     elif filter_type == 'lowpass':
         if verbose: print(f"| Applying butterworth lowpass filter: {lowcut} Hz {order} order")
-        filtered_data = butter_lowpass_filter(emg_data, lowcut, fs, order)
+        sos = butter_lowpass(lowcut, fs, order)
+
+    filtered_data = xsig.sosfiltfilt(xp.asarray(sos), xp.asarray(emg_data), axis=axis)
+    filtered_data = _to_input_type(filtered_data, emg_data, xp)
 
     toc = time.process_time()
     if verbose:
         print(f"| | Filtering time = {1000 * (toc - tic):.2f} ms")
 
-    # Convert list of arrays to a single 2D numpy array
-    filtered_data = np.stack(filtered_data, axis=0)  # Stack along axis 0 (channels)
-
     return filtered_data
 
 
@@ -199,39 +420,75 @@ def rectify_emg(emg_data):
     return rectified_data
 
 
-def window_rms(emg_data, window_size=400, verbose=False):
+def _weighted_moving_average(data, window, window_size, axis=-1):
+    """
+    Moving average of the data weighted by a tapered window, centered like np.convolve(..., mode='same').
+
+    Args:
+        data: Numpy array to smooth.
+        window: Window type accepted by scipy.signal.get_window (e.g., 'hann').
+        window_size: Length of the window in samples.
+        axis: Axis to smooth along.
+
+    Returns:
+        Smoothed data (same shape as input).
+    """
+    kernel = sp_signal.get_window(window, window_size, fftbins=False)
+    kernel = np.expand_dims(kernel / kernel.sum(), tuple(i for i in range(data.ndim) if i != axis % data.ndim))
+    # Direct convolution is O(N * window_size), overlap-add FFT convolution is O(N log window_size) and wins for long
+    # windows
+    if window_size > OACONVOLVE_MIN_WINDOW:
+        return sp_signal.oaconvolve(data, kernel, mode='same', axes=axis)
+    return sp_signal.convolve(data, kernel, mode='same', method='direct')
+
+
+def window_rms(emg_data, window_size=400, verbose=False, window='boxcar'):
     """
     Apply windowed RMS to each channel in the multi-channel EMG data.
 
     Args:
-        emg_data: Numpy array of shape (num_samples, num_channels).
+        emg_data: Numpy array of shape (num_channels, num_samples).
         window_size: Size of the window for RMS calculation.
+        window: Weighting window for the mean of the squared signal, any window accepted by scipy.signal.get_window.
 
     Returns:
         Smoothed EMG data with windowed RMS applied to each channel (same shape as input).
     """
     if verbose: print(f"| Applying windowed RMS with window size {window_size}")
-    num_channels, num_samples = emg_data.shape
-    rms_data = np.zeros((num_channels, num_samples))
 
-    for i in range(num_channels):
-        rms_data[i, :] = window_rms_1D(emg_data[i, :], window_size)
+    squared = np.square(emg_data, dtype=np.float64)
+    if window == 'boxcar':
+        # Boxcar moving average of the squared signal along the time axis for all channels in one pass
+        mean_sq = uniform_filter1d(squared, window_size, axis=1, mode='constant')
+    else:
+        mean_sq = _weighted_moving_average(squared, window, window_size, axis=1)
+    rms_data = np.sqrt(np.maximum(mean_sq, 0.0, out=mean_sq), out=mean_sq)  # Clip round-off negatives
 
     return rms_data
 
 
-def window_rms_1D(signal, window_size):
+def window_rms_1D(signal, window_size, window='boxcar'):
     """
     Compute windowed RMS of the signal.
 
     Args:
         signal: Input EMG signal.
         window_size: Size of the window for RMS calculation.
+        window: Weighting window for the mean of the squared signal, any window accepted by scipy.signal.get_window.
 
     Returns:
         Windowed RMS signal.
     """
-    return np.sqrt(np.convolve(signal ** 2, np.ones(window_size) / window_size, mode='same'))
+    if window != 'boxcar':
+        mean_sq = _weighted_moving_average(np.square(signal, dtype=np.float64), window, window_size)
+        return np.sqrt(np.maximum(mean_sq, 0.0))
+
+    # Boxcar moving average of the squared signal from a prefix sum, equivalent to
+    # np.convolve(signal ** 2, np.ones(window_size) / window_size, mode='same') but O(N) instead of O(N * window_size)
+    squared = np.pad(np.square(signal, dtype=np.float64), (window_size // 2, window_size - 1 - window_size // 2))
+    csum = np.concatenate(([0.0], np.cumsum(squared)))
+    mean_sq = (csum[window_size:] - csum[:-window_size]) / window_size
+    return np.sqrt(np.maximum(mean_sq, 0.0))  # Clip round-off negatives from the subtraction
 
 # Root mean square (RMS) calculation
 def old_calculate_rms(data, window_size=300):
@@ -260,12 +517,10 @@ def calculate_rms(data, window_size, verbose=False):
         print("| Calculating RMS features...")
     n_channels, n_samples = data.shape
     n_windows = n_samples // window_size
-    rms_features = np.zeros((n_channels, n_windows))
 
-    for ch in range(n_channels):
-        for i in range(n_windows):
-            window = data[ch, i * window_size:(i + 1) * window_size]
-            rms_features[ch, i] = np.sqrt(np.mean(window ** 2))
+    # Reshape into (n_channels, n_windows, window_size) and fuse the square and sum in a single pass
+    windows = data[:, :n_windows * window_size].reshape(n_channels, n_windows, window_size)
+    rms_features = np.sqrt(np.einsum('cnw,cnw->cn', windows, windows) / window_size)
 
     return rms_features  # Shape (n_channels, n_windows)
 
@@ -289,12 +544,14 @@ def downsample_data(emg_data, sampling_rate, target_fs=1000):
 
     return downsampled_data
 
-def common_average_reference(emg_data, verbose=False):
+def common_average_reference(emg_data, verbose=False, out=None):
     """
     Applies Common Average Referencing (CAR) to the multi-channel EMG data.
 
     Args:
         emg_data: 2D numpy array of shape (num_channels, num_samples).
+        out: Optional preallocated array of the same shape to write the result into, e.g. a buffer reused across
+            calls. Pass emg_data itself to reference the data in-place.
 
     Returns:
         car_data: 2D numpy array after applying CAR (same shape as input).
@@ -305,44 +562,102 @@ def common_average_reference(emg_data, verbose=False):
     common_avg = np.mean(emg_data, axis=0)  # Shape: (num_samples,)
 
     # Subtract the common average from each channel
-    car_data = emg_data - common_avg  # Broadcast subtraction across channels
+    car_data = np.subtract(emg_data, common_avg, out=out)  # Broadcast subtraction across channels
 
     return car_data
 
 
-def envelope_extraction(data, method='hilbert'):
+def envelope_extraction(data, method='hilbert', backend='numpy', fs=None, cutoff=10.0, order=4):
+    """
+    Extracts the amplitude envelope of each channel of the EMG data.
+
+    Args:
+        data: 2D array of shape (num_channels, num_samples).
+        method: 'hilbert' for the magnitude of the analytic signal, or 'rectify_lowpass' to rectify and low-pass
+            filter the signal, a cheaper approximation that avoids the complex FFTs.
+        backend: 'numpy' to process on the CPU, or 'cupy' to process on the GPU.
+        fs: Sampling rate of the data, required for 'rectify_lowpass'.
+        cutoff: Cutoff frequency of the 'rectify_lowpass' smoothing filter.
+        order: Order of the 'rectify_lowpass' smoothing filter.
+
+    Returns:
+        envelope: Array of the same shape and array type as the input data.
+    """
+    xp, xsig = _get_backend(backend)
     if method == 'hilbert':
-        analytic_signal = hilbert(data, axis=1)
-        envelope = np.abs(analytic_signal)
+        analytic_signal = xsig.hilbert(xp.asarray(data), axis=1)
+        envelope = xp.abs(analytic_signal)
+    elif method == 'rectify_lowpass':
+        if fs is None:
+            raise ValueError("Sampling rate 'fs' is required for the rectify_lowpass envelope.")
+        rectified = xp.abs(xp.asarray(data))
+        sos = butter_lowpass(cutoff, fs, order)
+        envelope = xsig.sosfiltfilt(xp.asarray(sos), rectified, axis=1)
     else:
         raise ValueError("Unsupported method for envelope extraction.")
-    return envelope
+    return _to_input_type(envelope, data, xp)
 
 
-def process_emg_pipeline(data, lowcut=30, highcut=500, order=5, window_size=400, verbose=False):
+def process_emg_pipeline(data, lowcut=30, highcut=500, order=5, window_size=400, verbose=False, backend='numpy',
+                         envelope_method='rectify_lowpass'):
     # Processing steps to match the CNN-ECA methodology
     # https://pmc.ncbi.nlm.nih.gov/articles/PMC10669079/
     # Input data is assumed to have shape (N_channels, N_samples)
+    # With backend='cupy' the data is moved to the GPU once and stays there until the envelope is computed
+    xp, _ = _get_backend(backend)
 
     emg_data = data['amplifier_data']  # Extract EMG data
     sample_rate = int(data['frequency_parameters']['board_dig_in_sample_rate'])  # Extract sampling rate
 
-    # Overwrite the first and last second of the data with 0 to remove edge effects
-    #emg_data[:, :sample_rate] = 0.0
-    emg_data[:, -sample_rate:] = 0.0  # Just first second
+    # Copy the data into the filter input (on the GPU for backend='cupy') so the caller's recording is left untouched
+    filter_input = xp.array(emg_data, dtype=np.result_type(emg_data.dtype, np.float32))
 
-    # Apply bandpass filter
-    bandpass_filtered = filter_emg(emg_data, 'bandpass', lowcut, highcut, sample_rate, order)
+    # Taper the first and last second of the filter input with the halves of a Tukey window to remove filter edge
+    # effects, rather than discarding those samples
+    edge = min(sample_rate, emg_data.shape[1] // 2)
+    if edge > 0:
+        ramp = xp.asarray(sp_signal.windows.tukey(2 * edge, alpha=1.0)[:edge])
+        filter_input[:, :edge] *= ramp
+        filter_input[:, -edge:] *= ramp[::-1]
 
-    # Rectify
-    #rectified = rectify_emg(bandpass_filtered)
-    rectified = bandpass_filtered
+    # Apply bandpass filter along the time axis
+    bandpass_filtered = filter_emg(filter_input, 'bandpass', lowcut, highcut, sample_rate, order, axis=1, backend=backend)
 
-    # Apply Smoothing
+    # Rectify and smooth, the rectify_lowpass envelope does both in one step
+    #rectified = rectify_emg(bandpass_filtered)
     #smoothed = window_rms(rectified, window_size=window_size)
-    smoothed = envelope_extraction(rectified, method='hilbert')
+    smoothed = envelope_extraction(bandpass_filtered, method=envelope_method, backend=backend, fs=sample_rate)
 
-    return smoothed
+    return _to_input_type(smoothed, emg_data, xp)
+
+
+def _process_emg_recording(recording, **kwargs):
+    """Loads the recording if given a .rhd file path, then runs it through process_emg_pipeline."""
+    if isinstance(recording, (str, os.PathLike)):
+        from utilities.rhd_utilities import load_file
+        recording, data_present = load_file(recording, verbose=kwargs.get('verbose', False))
+        if not data_present:
+            return None
+    return process_emg_pipeline(recording, **kwargs)
+
+
+def process_emg_pipeline_batch(recordings, n_jobs=-1, **kwargs):
+    """
+    Runs process_emg_pipeline on several independent recordings in parallel worker processes.
+
+    Args:
+        recordings: List of .rhd file paths or already loaded data dicts. Paths are loaded inside the workers, which
+            avoids sending the full recordings to them.
+        n_jobs: Number of worker processes, -1 uses all CPU cores.
+        **kwargs: Keyword arguments passed on to process_emg_pipeline.
+
+    Returns:
+        List with the processed data of each recording, in input order (None for files without data).
+    """
+    # process_emg_pipeline does not modify its input, so the recordings are left unchanged whether joblib runs the
+    # jobs in-process (n_jobs=1), pickles them or shares them as read-only memory maps
+    return Parallel(n_jobs=n_jobs, backend='loky')(
+        delayed(_process_emg_recording)(recording, **kwargs) for recording in recordings)
 
 
 def sliding_window(data, window_size, step_size):
@@ -355,16 +670,17 @@ def sliding_window(data, window_size, step_size):
         step_size: Step size in number of samples.
 
     Returns:
-        windows: List of numpy arrays, each representing a window of data.
+        windows: 3D numpy array of shape (num_windows, channels, window_size). This is a read-only strided view into
+            data, use np.ascontiguousarray on it if a contiguous copy is needed.
     """
     num_channels, num_samples = data.shape
-    windows = []
+    if num_samples < window_size:
+        return np.empty((0, num_channels, window_size), dtype=data.dtype)
 
-    for start in range(0, num_samples - window_size + 1, step_size):
-        window = data[:, start:start + window_size]
-        windows.append(window)
+    # Zero-copy view of every window start, subsampled by the step size
+    windows = np.lib.stride_tricks.sliding_window_view(data, window_size, axis=1)[:, ::step_size]
 
-    return windows
+    return windows.transpose(1, 0, 2)
 
 
 def apply_pca(data, num_components=8, verbose=False):
@@ -415,47 +731,48 @@ def apply_gesture_label(df, sampling_rate, data_metrics, start_index_name='Start
     gesture = data_metrics[gesture_name]
     print(f"Gesture: {gesture}")
 
-    # Iterate over each trial and assign the gesture label to the corresponding samples
-    for i in range(n_trials):
-        # Get start and end indices for the flex (gesture) and relax
-        start_flex = start_idx + i * sampling_rate * trial_interval
-        end_flex = start_flex + sampling_rate * trial_interval / 2  # Flex is half of interval
+    # Get start and end indices for the flex (gesture) and relax of every trial
+    start_flex = start_idx + np.arange(n_trials) * sampling_rate * trial_interval
+    end_flex = start_flex + sampling_rate * trial_interval / 2  # Flex is half of interval
 
-        # Label the flex periods as the gesture
-        df.loc[start_flex:end_flex, 'Gesture'] = gesture
+    # Convert the (inclusive) index labels to row positions, same as slicing with df.loc[start_flex:end_flex]
+    start_pos = df.index.searchsorted(start_flex, side='left')
+    end_pos = df.index.searchsorted(end_flex, side='right')
 
-    return df
-
-def z_score_norm(data):
-    """
-    Apply z-score normalization to the input data.
-
-    Args:
-        data: 2D numpy array of shape (channels, samples).
-
-    Returns:
-        normalized_data: 2D numpy array of shape (channels, samples) after z-score normalization.
-    """
-    mean = np.mean(data, axis=1)[:, np.newaxis]
-    std = np.std(data, axis=1)[:, np.newaxis]
-    normalized_data = (data - mean) / std
-    return normalized_data
+    # Mark every row that falls inside a flex period with a difference array instead of one .loc call per trial
+    in_flex = np.zeros(len(df) + 1, dtype=np.int64)
+    np.add.at(in_flex, start_pos, 1)
+    np.add.at(in_flex, end_pos, -1)
+    in_flex = np.cumsum(in_flex[:-1]) > 0
 
+    # Label the flex periods as the gesture, keeping any existing labels elsewhere
+    if 'Gesture' in df:
+        labels = df['Gesture'].to_numpy(dtype=object, copy=True)
+    else:
+        labels = np.full(len(df), np.nan, dtype=object)
+    labels[in_flex] = gesture
+    df['Gesture'] = pd.Categorical(labels)
 
+    return df
 
-def z_score_norm(data):
+def z_score_norm(data, out=None):
     """
     Apply z-score normalization to the input data.
 
     Args:
         data: 2D numpy array of shape (channels, samples).
+        out: Optional preallocated array of the same shape to write the result into. Pass data itself (floating
+            point) to normalize in-place.
 
     Returns:
         normalized_data: 2D numpy array of shape (channels, samples) after z-score normalization.
     """
-    mean = np.mean(data, axis=1)[:, np.newaxis]
-    std = np.std(data, axis=1)[:, np.newaxis]
-    normalized_data = (data - mean) / std
+    mean = np.mean(data, axis=1, keepdims=True)
+    # Center into the output array, then take the variance from the centered values so no extra temporaries are
+    # needed. Computing it as E[x^2] - mean^2 would save nothing here and loses precision for channels with a DC offset.
+    normalized_data = np.subtract(data, mean, out=out)
+    var = np.einsum('ij,ij->i', normalized_data, normalized_data)[:, np.newaxis] / data.shape[1]
+    normalized_data /= np.sqrt(var)
     return normalized_data
 
 # RMS (Root Mean Square)
@@ -472,6 +789,22 @@ def compute_mas(emg_window):
     magnitude_spectrum = np.abs(fft_values)
     return np.median(magnitude_spectrum)
 
+def compute_mas_batch(emg_windows):
+    """
+    Computes the MAS of many windows at once, equivalent to [compute_mas(w) for w in emg_windows].
+
+    Args:
+        emg_windows: 2D numpy array of shape (num_windows, window_size).
+
+    Returns:
+        mas: 1D numpy array of shape (num_windows,).
+    """
+    # The spectrum of a real window is conjugate-symmetric, so only the non-negative frequencies are computed (in one
+    # call spread over all CPU cores) and the mirrored bins are appended to take the median over the full spectrum
+    n = emg_windows.shape[1]
+    magnitude_spectrum = np.abs(rfft(emg_windows, axis=1, workers=-1))
+    return np.median(np.concatenate((magnitude_spectrum, magnitude_spectrum[:, 1:(n + 1) // 2]), axis=1), axis=1)
+
 # SampEn (Sample Entropy)
 import antropy as ant
 
@@ -3,7 +3,6 @@ import socket
 import serial
 import numpy as np
 import collections
-from statistics import mode, StatisticsError
 
 
 class PicoMessager:
@@ -21,6 +20,8 @@ class PicoMessager:
         self.port = port
         self.baudrate = baudrate
         self.buffer = collections.deque(maxlen=buffer_size)
+        self.counts = collections.Counter()  # Running count of each gesture in the buffer
+        self.max_gesture, self.max_count = None, 0  # Most common gesture in the buffer and its count
         self.current_gesture = None  # Keep track of the current gesture being sent
         self.verbose = verbose
         self.running = True  # To control the connection
@@ -53,15 +54,25 @@ class PicoMessager:
         Args:
             new_gesture (str): The newly detected gesture.
         """
+        # Remove the gesture about to be evicted from the running counts
+        if len(self.buffer) == self.buffer.maxlen:
+            evicted = self.buffer[0]
+            self.counts[evicted] -= 1
+            if evicted == self.max_gesture:
+                # The most common gesture lost a vote, so another gesture may have overtaken it
+                self.max_count -= 1
+                leader = max(self.counts, key=self.counts.get)
+                if self.counts[leader] > self.max_count:
+                    self.max_gesture, self.max_count = leader, self.counts[leader]
+
         # Update the gesture buffer
         self.buffer.append(new_gesture)
+        self.counts[new_gesture] += 1
 
-        # Find the most common gesture in the buffer
-        try:
-            most_common_gesture = mode(self.buffer)
-        except StatisticsError:
-            # If mode cannot be determined, continue without change
-            most_common_gesture = None
+        # Track the most common gesture in the buffer incrementally
+        if self.counts[new_gesture] > self.max_count:
+            self.max_gesture, self.max_count = new_gesture, self.counts[new_gesture]
+        most_common_gesture = self.max_gesture
 
         # If the most common gesture changes, update current_gesture and send the new message
         if most_common_gesture and most_common_gesture != self.current_gesture:
@@ -136,34 +147,60 @@ class TCPClient:
         self.s.close()
 
 class RingBuffer:
-    """Fixed-size ring buffer for storing recent data up to max number of samples. """
-    def __init__(self, num_channels, size_max=4000):
+    """Fixed-size ring buffer for storing recent data up to max number of samples.
+
+    Samples are stored channel-major with shape (num_channels, size_max), so each channel's time series is contiguous
+    in memory for the per-channel filtering done downstream.
+
+    The backing storage is mirrored: it holds two copies of the buffer back to back and every sample is written to
+    both. Any run of the most recent n samples is then a single contiguous slice, so reads never need to copy the
+    data to stitch the wrap-around back together.
+
+    Samples can be kept in the amplifier's native integer format (e.g. dtype=np.int16 with scale=0.195 uV per bit for
+    Intan), which halves the memory traffic compared to float32. get_samples_f32 converts a window to scaled float32
+    on demand.
+
+    Args:
+        num_channels (int): Number of channels per sample.
+        size_max (int): Maximum number of samples kept in the buffer.
+        dtype: Data type the samples are stored as.
+        scale (float): Physical units per stored unit, applied by get_samples_f32.
+    """
+    def __init__(self, num_channels, size_max=4000, dtype=np.float32, scale=1.0):
         self.max = size_max
-        self.samples = np.zeros((size_max, num_channels), dtype=np.float32)
-        self.timestamp = np.zeros(size_max, dtype=np.float32)
+        self.scale = scale
+        self._storage = np.zeros((num_channels, 2 * size_max), dtype=dtype, order='C')
+        self._timestamp_storage = np.zeros(2 * size_max, dtype=np.float32)
+        self.samples = self._storage[:, :size_max]
+        self.timestamp = self._timestamp_storage[:size_max]
         self.cur = 0
         self.size = 0
 
     def append(self, t, x):
         """Adds a new sample to the buffer, removing the oldest sample if full."""
-        self.samples[self.cur] = x
-        self.timestamp[self.cur] = t
+        mirror = self.cur + self.max
+        self._storage[:, self.cur] = x
+        self._storage[:, mirror] = x
+        self._timestamp_storage[self.cur] = t
+        self._timestamp_storage[mirror] = t
         self.cur = (self.cur + 1) % self.max
         self.size = min(self.size + 1, self.max)
 
     def get_samples(self, n=1):
-        """ Returns the current data in the ring buffer. """
-        #return self.samples
+        """ Returns the last n samples in the ring buffer with shape (num_channels, n), and their timestamps.
+
+        The returned arrays are views into the buffer and are overwritten as new samples are appended.
+        """
         if n > self.size:
             raise ValueError("Requested more samples than available in the buffer.")
-        end_idx = self.cur if self.size == self.max else self.size
-        start_idx = (end_idx - n) % self.max
-        if start_idx < end_idx:
-            return self.samples[start_idx:end_idx], self.timestamp[start_idx:end_idx]
-        else:
-            # When the wrap-around occurs
-            return np.vstack((self.samples[start_idx:], self.samples[:end_idx])), \
-                np.hstack((self.timestamp[start_idx:], self.timestamp[:end_idx]))
+        start_idx = (self.cur - n) % self.max
+        # The mirrored half continues past the end of the first, so this slice never wraps
+        return self._storage[:, start_idx:start_idx + n], self._timestamp_storage[start_idx:start_idx + n]
+
+    def get_samples_f32(self, n=1):
+        """ Returns a float32 copy of the last n samples scaled to physical units, and a copy of their timestamps. """
+        samples, timestamps = self.get_samples(n)
+        return np.multiply(samples, self.scale, dtype=np.float32), timestamps.copy()
 
     def is_full(self):
         return self.size == self.max
\ No newline at end of file